@@ -11,11 +11,21 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 import os
+import sys
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Media files (uploaded inputs and converted exports). Test runs write to a
+# throwaway tmpdir so uploads/exports from the suite never land in the
+# working tree. Must be settled here: modules derive their upload/export
+# paths from this at import time.
+MEDIA_ROOT = BASE_DIR
+if 'test' in sys.argv[:2]:
+    MEDIA_ROOT = Path(tempfile.mkdtemp(prefix='md2docx-test-media-'))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -80,6 +90,10 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Run tests against an in-memory database so fixture INSERTs pay no
+        # journal/fsync disk IO. Made explicit so switching NAME (or backend)
+        # later doesn't silently put the test DB on disk.
+        'TEST': {'NAME': ':memory:'},
     }
 }
 
@@ -120,6 +134,13 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Hand completed downloads to the front-end server (nginx X-Accel-Redirect)
+# instead of streaming them through WSGI. Requires an internal location
+# mapping MD2DOCX_ACCEL_PREFIX to MEDIA_ROOT, e.g.
+#   location /protected/ { internal; alias /path/to/media/; }
+MD2DOCX_USE_XSENDFILE = os.getenv('MD2DOCX_USE_XSENDFILE') == '1'
+MD2DOCX_ACCEL_PREFIX = os.getenv('MD2DOCX_ACCEL_PREFIX', '/protected/')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
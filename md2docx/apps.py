@@ -1,3 +1,4 @@
+import atexit
 import logging
 import subprocess
 
@@ -10,17 +11,120 @@ class Md2DocxConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'md2docx'
 
+    # manage.py commands that never convert a document; probing pandoc (two
+    # Haskell-runtime startups) from them only slows their boot.
+    _PANDOC_FREE_COMMANDS = {
+        'migrate', 'makemigrations', 'collectstatic', 'shell', 'test',
+        'check', 'sqlmigrate', 'showmigrations',
+    }
+
     def ready(self):
         """Import signals when the app is ready."""
         from . import signals  # noqa: F401
 
+        self._ensure_media_dirs()
+
+        if self._skip_pandoc_bootstrap():
+            return
+
         # Best-effort pandoc/pdf availability check (non-fatal)
         self._check_pandoc_capabilities()
 
+        # Best-effort long-lived pandoc server so conversions skip per-task
+        # pandoc startup (non-fatal; workers fall back to subprocess).
+        self._start_pandoc_server()
+
+    def _ensure_media_dirs(self):
+        """Create the uploads/exports dirs once per process.
+
+        Previously every module that touched them (views, signals, the
+        worker command) ran its own mkdir at import time; doing it here
+        keeps the stat/mkdir syscalls to one place on boot.
+        """
+        from django.conf import settings
+        from pathlib import Path
+
+        media_root = Path(getattr(settings, 'MEDIA_ROOT', settings.BASE_DIR))
+        (media_root / 'exports').mkdir(parents=True, exist_ok=True)
+        (media_root / 'uploads').mkdir(parents=True, exist_ok=True)
+
+    def _skip_pandoc_bootstrap(self):
+        """Whether this process has no use for pandoc (migrations, tests, ...)."""
+        import os
+        import sys
+
+        if os.environ.get('MD2DOCX_SKIP_PANDOC_CHECK') == '1':
+            return True
+        return len(sys.argv) > 1 and sys.argv[1] in self._PANDOC_FREE_COMMANDS
+
+    def _start_pandoc_server(self):
+        """Launch `pandoc server` once per process (non-fatal on failure)."""
+        from . import pandoc_server
+        import os
+        import sys
+
+        self.pandoc_server = None
+        pandoc_bin = os.getenv('PANDOC_BIN', 'pandoc')
+
+        # The docker wrapper cannot host a long-lived server process.
+        if 'pandoc_docker.sh' in pandoc_bin:
+            logger.info(
+                "Skipping pandoc server start (PANDOC_BIN uses docker wrapper): %s",
+                pandoc_bin,
+            )
+            return
+
+        # Under runserver's autoreloader only the reloaded child serves
+        # requests; the watcher parent must not grab the server port too.
+        if 'runserver' in sys.argv and os.environ.get('RUN_MAIN') != 'true':
+            return
+
+        # The server subcommand only exists in pandoc >= 3; with an older
+        # binary the Popen'd process exits immediately and every conversion
+        # would pay a refused-connect round trip before falling back.
+        try:
+            version_line = subprocess.run(
+                [pandoc_bin, '--version'],
+                capture_output=True, text=True, check=True, timeout=10,
+            ).stdout.splitlines()[0]
+            major = int(version_line.split()[1].split('.')[0])
+        except Exception as exc:  # pragma: no cover - environment dependent
+            logger.warning("could not determine pandoc version: %s", exc)
+            return
+        if major < 3:
+            logger.warning(
+                "%s has no 'server' subcommand (pandoc >= 3 required); "
+                "conversions will use one-shot subprocesses",
+                version_line,
+            )
+            return
+
+        try:
+            self.pandoc_server = subprocess.Popen(
+                [pandoc_bin, 'server', f'--port={pandoc_server.SERVER_PORT}'],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            atexit.register(self.pandoc_server.terminate)
+        except Exception as exc:  # pragma: no cover - environment dependent
+            self.pandoc_server = None
+            logger.warning("could not start pandoc server: %s", exc)
+
     def _check_pandoc_capabilities(self):
-        """Log warnings if pandoc or pdf engine is unavailable."""
+        """Log warnings if pandoc or pdf engine is unavailable.
+
+        The parsed format lists are cached on disk keyed by the `pandoc
+        --version` output, so repeated boots (autoreload restarts, multiple
+        gunicorn workers) pay one cheap version probe instead of two full
+        format-table loads.
+        """
         from .formats import REQUIRED_OUTPUTS, REQUIRED_INPUTS
+        from django.conf import settings
+        import hashlib
+        import json
         import os
+        import sys
+        from pathlib import Path
 
         pandoc_bin = os.getenv('PANDOC_BIN', 'pandoc')
 
@@ -33,34 +137,63 @@ class Md2DocxConfig(AppConfig):
             )
             return
 
+        # Under runserver's autoreloader only the reloaded child (RUN_MAIN)
+        # serves requests; don't probe from the watcher parent as well.
+        if 'runserver' in sys.argv and os.environ.get('RUN_MAIN') != 'true':
+            return
+
         try:
-            out = subprocess.run(
-                [pandoc_bin, '--list-output-formats'],
+            version = subprocess.run(
+                [pandoc_bin, '--version'],
                 capture_output=True,
                 text=True,
                 check=True,
                 timeout=10,
-            )
-            outputs = set(out.stdout.split())
-            missing = [fmt for fmt in REQUIRED_OUTPUTS if fmt not in outputs]
-            if missing:
-                logger.warning("pandoc missing output formats: %s", ', '.join(missing))
-            if 'pdf' not in outputs:
-                logger.warning("pandoc PDF engine not available; install LaTeX (texlive) to enable PDF output")
+            ).stdout
         except Exception as exc:  # pragma: no cover - environment dependent
-            logger.warning("pandoc output formats check failed: %s", exc)
+            logger.warning("pandoc capability check failed: %s", exc)
+            return
+
+        version_key = hashlib.sha256(version.encode('utf-8')).hexdigest()
+        media_root = Path(getattr(settings, 'MEDIA_ROOT', settings.BASE_DIR))
+        cache_path = media_root / '.pandoc_caps.json'
 
+        outputs = inputs = None
         try:
-            out = subprocess.run(
-                [pandoc_bin, '--list-input-formats'],
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=10,
-            )
-            inputs = set(out.stdout.split())
-            missing_in = [fmt for fmt in REQUIRED_INPUTS if fmt not in inputs]
-            if missing_in:
-                logger.warning("pandoc missing input readers: %s", ', '.join(missing_in))
-        except Exception as exc:  # pragma: no cover - environment dependent
-            logger.warning("pandoc input formats check failed: %s", exc)
+            cached = json.loads(cache_path.read_text(encoding='utf-8'))
+            if cached.get('version') == version_key:
+                outputs = set(cached['outputs'])
+                inputs = set(cached['inputs'])
+        except Exception:
+            pass
+
+        if outputs is None or inputs is None:
+            try:
+                outputs = set(subprocess.run(
+                    [pandoc_bin, '--list-output-formats'],
+                    capture_output=True, text=True, check=True, timeout=10,
+                ).stdout.split())
+                inputs = set(subprocess.run(
+                    [pandoc_bin, '--list-input-formats'],
+                    capture_output=True, text=True, check=True, timeout=10,
+                ).stdout.split())
+            except Exception as exc:  # pragma: no cover - environment dependent
+                logger.warning("pandoc format listing failed: %s", exc)
+                return
+            try:
+                cache_path.write_text(json.dumps({
+                    'version': version_key,
+                    'outputs': sorted(outputs),
+                    'inputs': sorted(inputs),
+                }), encoding='utf-8')
+            except Exception:  # pragma: no cover - cache is best effort
+                pass
+
+        missing = [fmt for fmt in REQUIRED_OUTPUTS if fmt not in outputs]
+        if missing:
+            logger.warning("pandoc missing output formats: %s", ', '.join(missing))
+        if 'pdf' not in outputs:
+            logger.warning("pandoc PDF engine not available; install LaTeX (texlive) to enable PDF output")
+        missing_in = [fmt for fmt in REQUIRED_INPUTS if fmt not in inputs]
+        if missing_in:
+            logger.warning("pandoc missing input readers: %s", ', '.join(missing_in))
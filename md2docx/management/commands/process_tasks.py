@@ -1,21 +1,33 @@
+import concurrent.futures
+import itertools
+import select
 import time
 import subprocess
+import tempfile
 import os
 from pathlib import Path
 
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
 
 from md2docx.models import ConversionTask
 from md2docx.formats import input_reader_for, DEFAULT_OUTPUT
+from md2docx import pandoc_server
 import re
 
 
 MEDIA_ROOT = Path(getattr(settings, 'MEDIA_ROOT', settings.BASE_DIR))
 EXPORTS_DIR = MEDIA_ROOT / 'exports'
 UPLOADS_DIR = MEDIA_ROOT / 'uploads'
-EXPORTS_DIR.mkdir(parents=True, exist_ok=True)
-UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+# Both directories are created once in Md2DocxConfig.ready().
+
+# Maximum number of tasks claimed per poll iteration
+CLAIM_BATCH = 100
+
+# Compiled once: allow letters, numbers, underscore and hyphen in filenames
+_SANITIZE_RE = re.compile(r"[^A-Za-z0-9_-]+")
 
 
 def _safe_output_name(task):
@@ -24,103 +36,246 @@ def _safe_output_name(task):
         stem = Path(task.original_filename).name
         stem = Path(stem).stem
         stem = stem.strip()
-        stem = re.sub(r"[^A-Za-z0-9_-]+", '_', stem)
+        stem = _SANITIZE_RE.sub('_', stem)
         if stem:
             return f"{stem}.{ext}"
     return f"{task.id}.{ext}"
 
 
 def _find_input_file(task):
-    matches = list(UPLOADS_DIR.glob(f"{task.id}.*"))
-    if matches:
-        return matches[0]
+    if task.input_ext:
+        return UPLOADS_DIR / f"{task.id}.{task.input_ext}"
+    # legacy rows without a stored extension: first scandir prefix match
+    prefix = f"{task.id}."
+    with os.scandir(UPLOADS_DIR) as entries:
+        match = next((entry for entry in entries if entry.name.startswith(prefix)), None)
+    if match is not None:
+        return UPLOADS_DIR / match.name
     return UPLOADS_DIR / f"{task.id}.md"
 
 
+def _advise_page_cache(path, advice_name):
+    """Best-effort posix_fadvise hint; no-op where unsupported.
+
+    Takes the advice constant's name so platforms without posix_fadvise
+    (where the POSIX_FADV_* constants don't exist either) never touch it.
+    """
+    advice = getattr(os, advice_name, None)
+    if advice is None or not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, advice)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+_FONT_HEADER = MEDIA_ROOT / 'templates' / 'fonts.latex'
+_FONT_HEADER_BODY = (
+    "\\setmainfont{DejaVu Sans}\n"
+    "\\setsansfont{DejaVu Sans}\n"
+    "\\setmonofont{DejaVu Sans Mono}\n"
+)
+
+
+def _pdf_font_header():
+    """Write the xelatex font preamble once and reuse it for every PDF build."""
+    if not _FONT_HEADER.exists():
+        _FONT_HEADER.parent.mkdir(parents=True, exist_ok=True)
+        _FONT_HEADER.write_text(_FONT_HEADER_BODY, encoding='utf-8')
+    return _FONT_HEADER
+
+
+def _pandoc_command(inp, outp, reader_name, fmt):
+    cmd = [
+        'pandoc',
+        '-o', str(outp),
+        '-f', reader_name,
+        '-t', fmt,
+        str(inp),
+    ]
+    if fmt == 'pdf':
+        cmd.extend([
+            '--pdf-engine=xelatex',
+            '--include-in-header', str(_pdf_font_header()),
+        ])
+    return cmd
+
+
 class Command(BaseCommand):
     help = 'Process pending md2docx ConversionTask entries and run pandoc to produce .docx files.'
 
     def add_arguments(self, parser):
         parser.add_argument('--once', action='store_true', help='Process pending tasks once and exit')
         parser.add_argument('--poll', type=int, default=5, help='Poll interval in seconds when running continuously')
+        parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                            help='Parallel pandoc invocations for non-batched conversions')
 
     def handle(self, *args, **options):
         once = options.get('once')
         poll = options.get('poll', 5)
+        self.jobs = options.get('jobs') or 1
 
         self.stdout.write(self.style.NOTICE('Starting task processor (pandoc worker)'))
 
         while True:
-            pending = ConversionTask.objects.filter(status=ConversionTask.STATUS_PENDING).order_by('created_at')
-            if not pending.exists():
+            pending = self._claim_pending()
+            if not pending:
                 if once:
                     self.stdout.write('No pending tasks, exiting')
                     return
-                time.sleep(poll)
+                self._wait_for_tasks(poll)
                 continue
 
-            for task in pending:
-                try:
-                    self.stdout.write(f'Processing task {task.id}...')
-                    task.status = ConversionTask.STATUS_PROCESSING
-                    task.progress = 5
-                    task.save()
-
-                    input_path = _find_input_file(task)
-                    input_ext = input_path.suffix.lstrip('.').lower()
-                    reader = input_reader_for(input_ext)
-                    output_filename = _safe_output_name(task)
-                    output_path = EXPORTS_DIR / output_filename
-
-                    # mark progress
-                    task.progress = 20
-                    task.save()
-
-                    output_fmt = (task.output_format or DEFAULT_OUTPUT).lstrip('.').lower()
-
-                    def _pandoc_command(inp, outp, reader_name, fmt):
-                        cmd = [
-                            'pandoc',
-                            '-o', str(outp),
-                            '-f', reader_name,
-                            '-t', fmt,
-                            str(inp),
-                        ]
-                        if fmt == 'pdf':
-                            cmd.extend([
-                                '--pdf-engine=xelatex',
-                                '-V', 'mainfont=DejaVu Sans',
-                                '-V', 'sansfont=DejaVu Sans',
-                                '-V', 'monofont=DejaVu Sans Mono',
-                            ])
-                        return cmd
-
-                    cmd = _pandoc_command(input_path, output_path, reader, output_fmt)
-                    proc = subprocess.run(cmd, capture_output=True, text=True)
-
-                    if proc.returncode == 0 and output_path.exists():
-                        # attach file path to model (relative to MEDIA_ROOT)
-                        rel = os.path.relpath(output_path, MEDIA_ROOT)
-                        task.result_file.name = rel
-                        task.status = ConversionTask.STATUS_DONE
-                        task.progress = 100
-                        task.error_message = ''
-                        task.save()
-                        self.stdout.write(self.style.SUCCESS(f'Task {task.id} finished'))
-                    else:
-                        task.status = ConversionTask.STATUS_FAILED
-                        task.progress = 0
-                        task.error_message = proc.stderr or proc.stdout or 'pandoc failed'
-                        task.save()
-                        self.stdout.write(self.style.ERROR(f'Task {task.id} failed: {task.error_message}'))
-
-                except Exception as exc:
-                    task.status = ConversionTask.STATUS_FAILED
-                    task.error_message = str(exc)
-                    task.progress = 0
-                    task.save()
-                    self.stdout.write(self.style.ERROR(f'Unexpected error processing {task.id}: {exc}'))
+            self._process_pending(pending)
 
             if once:
                 return
+
+    def _wait_for_tasks(self, poll):
+        """Block until new work is likely available.
+
+        On PostgreSQL this LISTENs for the NOTIFY emitted when a task is
+        created, so mean pickup latency drops from ~poll/2 seconds to
+        near zero; other backends fall back to the poll-interval sleep.
+        """
+        if connection.vendor != 'postgresql':
+            time.sleep(poll)
+            return
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('LISTEN md2docx_task')
+            pg_conn = connection.connection
+            select.select([pg_conn], [], [], poll)
+            pg_conn.poll()
+            del pg_conn.notifies[:]
+        except Exception:  # pragma: no cover - environment dependent
             time.sleep(poll)
+
+    def _claim_pending(self):
+        """Atomically claim a page of pending tasks for this worker.
+
+        Claimed rows are flipped to PROCESSING inside the same transaction;
+        with SKIP LOCKED (where the backend supports it) concurrent workers
+        never pick up the same task. One query replaces the previous
+        exists() probe plus re-issued SELECT.
+        """
+        with transaction.atomic():
+            # Keep only the potentially-large input_markdown TEXT out of the
+            # poll. The worker both reads and writes back result_file and
+            # error_message, so a narrower .only() projection would trigger a
+            # deferred-field refresh query per task in _record_result.
+            qs = ConversionTask.objects.defer(
+                'input_markdown',
+            ).filter(status=ConversionTask.STATUS_PENDING).order_by('created_at')
+            if connection.features.has_select_for_update:
+                qs = qs.select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+            tasks = list(qs[:CLAIM_BATCH])
+            if tasks:
+                ConversionTask.objects.filter(pk__in=[t.pk for t in tasks]).update(
+                    status=ConversionTask.STATUS_PROCESSING, progress=5, updated_at=timezone.now())
+        for task in tasks:
+            task.status = ConversionTask.STATUS_PROCESSING
+            task.progress = 5
+        return tasks
+
+    def _process_pending(self, tasks):
+        """Convert a page of already-claimed tasks.
+
+        Same-format groups go through the pandoc server in one batch request;
+        the rest (PDF, or any server failure) fall back to per-task pandoc
+        subprocesses. All final states are flushed in a single bulk_update
+        instead of one save() per task.
+        """
+        jobs = []
+        for task in tasks:
+            self.stdout.write(f'Processing task {task.id}...')
+            input_path = _find_input_file(task)
+            # The upload is read exactly once, start to finish
+            _advise_page_cache(input_path, 'POSIX_FADV_SEQUENTIAL')
+            input_ext = input_path.suffix.lstrip('.').lower()
+            reader = input_reader_for(input_ext)
+            output_fmt = (task.output_format or DEFAULT_OUTPUT).lstrip('.').lower()
+            output_path = EXPORTS_DIR / _safe_output_name(task)
+            jobs.append((task, input_path, reader, output_fmt, output_path))
+
+        finished = []
+        fallback = []
+        group_key = lambda job: (job[2], job[3])  # (reader, output_fmt)
+        for (reader, output_fmt), group in itertools.groupby(sorted(jobs, key=group_key), key=group_key):
+            group = list(group)
+            if not pandoc_server.supports(output_fmt):
+                fallback.extend(group)
+                continue
+            try:
+                texts = [pandoc_server.read_text(job[1]) for job in group]
+                errors = pandoc_server.convert_batch(texts, reader, output_fmt, [job[4] for job in group])
+            except Exception:
+                # Batch endpoint unreachable or the whole request rejected:
+                # every item gets the single-conversion retry below.
+                errors = ['batch request failed'] * len(group)
+            for (task, input_path, _reader, _fmt, output_path), error in zip(group, errors):
+                if error is not None:
+                    # Retry the item on the server individually before
+                    # giving up on it and paying a pandoc startup.
+                    try:
+                        text = pandoc_server.read_text(input_path)
+                        pandoc_server.convert(text, reader, output_fmt, output_path)
+                    except Exception:
+                        fallback.append((task, input_path, reader, output_fmt, output_path))
+                        continue
+                self._record_result(task, output_path, converted=True, error_output='')
+                finished.append(task)
+
+        if fallback:
+            # Pandoc is CPU-bound and single-threaded per invocation, so run
+            # the fallback conversions in parallel; the worker threads just
+            # wait on their subprocesses while pandoc uses the cores.
+            workers = max(1, min(self.jobs, len(fallback)))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                for task, output_path, converted, error_output in pool.map(self._convert_one, fallback):
+                    self._record_result(task, output_path, converted=converted, error_output=error_output)
+                    finished.append(task)
+
+        ConversionTask.objects.bulk_update(
+            finished, ['status', 'progress', 'result_file', 'error_message', 'updated_at']
+        )
+
+    def _convert_one(self, job):
+        """Run one pandoc subprocess; no DB writes (safe to run in a pool)."""
+        task, input_path, reader, output_fmt, output_path = job
+        try:
+            cmd = _pandoc_command(input_path, output_path, reader, output_fmt)
+            # Discard stdout and spool stderr; decode it only on failure.
+            error_output = ''
+            with tempfile.SpooledTemporaryFile(max_size=64 * 1024) as stderr_spool:
+                proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=stderr_spool)
+                converted = proc.returncode == 0 and output_path.exists()
+                if not converted:
+                    stderr_spool.seek(0)
+                    # bounded: don't store megabytes of LaTeX errors in the DB
+                    error_output = stderr_spool.read().decode('utf-8', errors='replace')[:4096] or 'pandoc failed'
+            return task, output_path, converted, error_output
+        except Exception as exc:
+            return task, output_path, False, str(exc)
+
+    def _record_result(self, task, output_path, converted, error_output):
+        task.updated_at = timezone.now()
+        if converted:
+            # The worker never re-reads outputs; keep them out of the page cache
+            _advise_page_cache(output_path, 'POSIX_FADV_DONTNEED')
+            # attach file path to model (relative to MEDIA_ROOT)
+            rel = os.path.relpath(output_path, MEDIA_ROOT)
+            task.result_file.name = rel
+            task.status = ConversionTask.STATUS_DONE
+            task.progress = 100
+            task.error_message = ''
+            self.stdout.write(self.style.SUCCESS(f'Task {task.id} finished'))
+        else:
+            task.status = ConversionTask.STATUS_FAILED
+            task.progress = 0
+            task.error_message = error_output
+            self.stdout.write(self.style.ERROR(f'Task {task.id} failed: {task.error_message}'))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-08-30 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('md2docx', '0003_merge_20251229_0000'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversiontask',
+            name='input_ext',
+            field=models.CharField(blank=True, max_length=16),
+        ),
+    ]
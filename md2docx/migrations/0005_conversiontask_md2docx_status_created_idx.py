@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-08-30 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('md2docx', '0004_conversiontask_input_ext'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversiontask',
+            index=models.Index(fields=['status', 'created_at'], name='md2docx_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-08-30 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('md2docx', '0005_conversiontask_md2docx_status_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversiontask',
+            index=models.Index(fields=['status', '-updated_at'], name='ct_status_updated_idx'),
+        ),
+    ]
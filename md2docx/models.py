@@ -22,15 +22,27 @@ class ConversionTask(models.Model):
 	]
 
 	id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+	# Deprecated: input is stored on disk as uploads/<id>.<ext>. Kept (always
+	# blank) until the column is dropped in a follow-up migration; worker
+	# queries defer it so the TEXT column stays out of hot reads.
 	input_markdown = models.TextField(blank=True)
 	status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
 	result_file = models.FileField(upload_to='exports/', null=True, blank=True)
 	error_message = models.TextField(blank=True)
 	original_filename = models.CharField(max_length=255, blank=True)
+	input_ext = models.CharField(max_length=16, blank=True)
 	output_format = models.CharField(max_length=32, default='docx')
 	progress = models.IntegerField(default=0)
 	created_at = models.DateTimeField(auto_now_add=True)
 	updated_at = models.DateTimeField(auto_now=True)
 
+	class Meta:
+		indexes = [
+			# the worker's pending scan: filter(status=...).order_by('created_at')
+			models.Index(fields=['status', 'created_at'], name='md2docx_status_created_idx'),
+			# the list view: filter(status=DONE).order_by('-updated_at')
+			models.Index(fields=['status', '-updated_at'], name='ct_status_updated_idx'),
+		]
+
 	def __str__(self) -> str:  # pragma: no cover - trivial
 		return f"ConversionTask({self.id}) {self.status}"
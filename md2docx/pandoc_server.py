@@ -0,0 +1,153 @@
+"""Client for a long-lived ``pandoc server`` process.
+
+Pandoc startup (Haskell runtime + format table load) dominates wall time for
+small documents, so a persistent server amortizes it across conversions. The
+server is launched once in ``Md2DocxConfig.ready()``; callers fall back to a
+regular pandoc subprocess when the server is unreachable or rejects a job.
+"""
+import base64
+import http.client
+import json
+import mmap
+import os
+import threading
+
+# Files below this size are plain-read; mapping them costs more than it saves
+_MMAP_THRESHOLD = 64 * 1024
+
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = int(os.getenv('PANDOC_SERVER_PORT', '3030'))
+
+# pandoc server cannot drive an external PDF engine; those conversions always
+# go through the pandoc CLI.
+UNSUPPORTED_OUTPUTS = {'pdf'}
+
+# Formats pandoc can only emit as complete documents; the CLI implies -s for
+# them. Requesting standalone only for these keeps server output identical to
+# the subprocess fallback, which passes no -s and so emits fragments for text
+# formats (html, md, tex, ...).
+_STANDALONE_OUTPUTS = frozenset({'docx', 'odt', 'epub', 'epub2', 'epub3', 'pptx'})
+
+# One keep-alive connection per worker thread; conversions in the thread
+# pools would otherwise serialize on a single shared socket.
+_local = threading.local()
+
+
+class PandocServerError(RuntimeError):
+    """Raised when the pandoc server reports a conversion failure."""
+
+
+def supports(output_fmt):
+    """Whether the server can produce the given output format."""
+    return (output_fmt or '').lower() not in UNSUPPORTED_OUTPUTS
+
+
+def read_text(path):
+    """Read an input file into the text for a server request.
+
+    Large files are memory-mapped and decoded straight from the mapping, so
+    the kernel pages them in on demand and the intermediate bytes copy of a
+    plain read() is skipped.
+    """
+    with open(path, 'rb') as fh:
+        size = os.fstat(fh.fileno()).st_size
+        if size < _MMAP_THRESHOLD:
+            return fh.read().decode('utf-8', errors='replace')
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return str(buf, 'utf-8', 'replace')
+
+
+def _connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = http.client.HTTPConnection(SERVER_HOST, SERVER_PORT, timeout=60)
+        _local.conn = conn
+    return conn
+
+
+def _drop_connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+def _post(url_path, body):
+    """POST a JSON body over this thread's keep-alive connection."""
+    headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+    for attempt in (0, 1):
+        conn = _connection()
+        try:
+            conn.request('POST', url_path, body, headers)
+            resp = conn.getresponse()
+            raw = resp.read()
+            break
+        except (BrokenPipeError, ConnectionResetError):
+            # Stale keep-alive socket (e.g. the server restarted between
+            # tasks): reconnect once before giving up.
+            _drop_connection()
+            if attempt:
+                raise
+        except Exception:
+            _drop_connection()
+            raise
+    if resp.status != 200:
+        raise PandocServerError(raw.decode('utf-8', errors='replace') or f'pandoc server returned {resp.status}')
+    return json.loads(raw.decode('utf-8'))
+
+
+def _write_result(result, output_path):
+    # A 200 batch response can still carry per-item failures; writing the
+    # missing 'output' as '' would leave an empty file callers mistake for
+    # a successful conversion.
+    if not isinstance(result, dict) or 'error' in result or 'output' not in result:
+        message = result.get('error') if isinstance(result, dict) else None
+        raise PandocServerError(message or 'pandoc server returned no output')
+    output = result['output']
+    if result.get('base64'):
+        output_path.write_bytes(base64.b64decode(output))
+    else:
+        output_path.write_text(output, encoding='utf-8')
+
+
+def convert(text, reader, output_fmt, output_path):
+    """Convert ``text`` via the server and write the result to ``output_path``.
+
+    Raises ``OSError`` when the server is unreachable and ``PandocServerError``
+    when it rejects the conversion, so callers can fall back to a subprocess.
+    The connection is kept alive between calls to avoid per-task reconnects.
+    """
+    body = json.dumps({
+        'text': text,
+        'from': reader,
+        'to': output_fmt,
+        'standalone': output_fmt in _STANDALONE_OUTPUTS,
+    })
+    _write_result(_post('/', body), output_path)
+
+
+def convert_batch(texts, reader, output_fmt, output_paths):
+    """Convert several same-format texts in a single ``/batch`` call.
+
+    One request amortizes server round-trips over the whole group; results
+    come back in submission order and are written to ``output_paths``.
+    Returns a list aligned with the inputs holding ``None`` for successes
+    and an error message for items the server rejected, so callers can
+    retry just the failures. Transport failures raise instead.
+    """
+    standalone = output_fmt in _STANDALONE_OUTPUTS
+    body = json.dumps([
+        {'text': text, 'from': reader, 'to': output_fmt, 'standalone': standalone}
+        for text in texts
+    ])
+    results = _post('/batch', body)
+    if not isinstance(results, list) or len(results) != len(output_paths):
+        raise PandocServerError('unexpected batch response shape')
+    errors = []
+    for result, output_path in zip(results, output_paths):
+        try:
+            _write_result(result, output_path)
+            errors.append(None)
+        except PandocServerError as exc:
+            errors.append(str(exc))
+    return errors
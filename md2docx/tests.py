@@ -1,47 +1,84 @@
 """Unit tests for md2docx format-aware conversion."""
 
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from django.conf import settings
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, Client, RequestFactory
 from django.urls import reverse
 from django.db.models.signals import post_save
 
+from . import pandoc_server
 from .models import ConversionTask
 from .signals import process_conversion_on_create
+from .views import api_upload
+
+
+# Disconnect the conversion signal once for the whole module: no test wants a
+# background conversion kicked off, and re-running the disconnect in every
+# TestCase's setUpClass was redundant after the first.
+post_save.disconnect(process_conversion_on_create, sender=ConversionTask)
 
 
 class BaseTestCase(TestCase):
-	"""Common setup: disable signal threads and provide client."""
+	"""Common setup: signal processing disabled module-wide; provides client."""
+
+	# Shared payload bytes for multipart tests. SimpleUploadedFile consumes
+	# its buffer on each post, so tests wrap these in a fresh upload object
+	# per call instead of rebuilding the bytes too.
+	_MD_BYTES = b'# Test'
 
 	@classmethod
-	def setUpClass(cls):
-		super().setUpClass()
-		post_save.disconnect(process_conversion_on_create, sender=ConversionTask)
+	def make_upload(cls, name='t.md'):
+		return SimpleUploadedFile(name, cls._MD_BYTES, content_type='text/markdown')
 
 	def setUp(self):
 		self.client = Client()
+		# The list view caches its COUNT(*); the cache survives between
+		# tests, so clear it to keep counts isolated per test method.
+		cache.clear()
 
 
 class ApiUploadFormatTest(BaseTestCase):
+	# Pure view tests: call api_upload directly via RequestFactory, skipping
+	# the middleware stack and URL resolver each request would re-run.
+	# ConvertViewFormatTest keeps the full Client for integration coverage.
+	factory = RequestFactory()
+
 	def test_accepts_valid_output_format(self):
-		response = self.client.post(
-			reverse('md2docx:api_upload'),
+		request = self.factory.post(
+			'/api/upload/',
 			{'markdown': '# Test', 'output_format': 'pdf'},
-			format='multipart'
 		)
+		response = api_upload(request)
 		self.assertEqual(response.status_code, 201)
-		task_id = response.json()['task_id']
+		task_id = json.loads(response.content)['task_id']
 		task = ConversionTask.objects.get(pk=task_id)
 		self.assertEqual(task.output_format, 'pdf')
 
+	def test_accepts_file_upload(self):
+		request = self.factory.post(
+			'/api/upload/',
+			{'file': self.make_upload(), 'output_format': 'docx'},
+		)
+		response = api_upload(request)
+		self.assertEqual(response.status_code, 201)
+		task_id = json.loads(response.content)['task_id']
+		task = ConversionTask.objects.get(pk=task_id)
+		self.assertEqual(task.original_filename, 't.md')
+
 	def test_rejects_invalid_output_format(self):
-		response = self.client.post(
-			reverse('md2docx:api_upload'),
+		request = self.factory.post(
+			'/api/upload/',
 			{'markdown': '# Test', 'output_format': 'exe'},
-			format='multipart'
 		)
+		response = api_upload(request)
 		self.assertEqual(response.status_code, 400)
-		self.assertIn('unsupported', response.json()['error'].lower())
+		self.assertIn('unsupported', json.loads(response.content)['error'].lower())
 
 
 class ConvertViewFormatTest(BaseTestCase):
@@ -64,6 +101,42 @@ class ConvertViewFormatTest(BaseTestCase):
 		self.assertEqual(response.status_code, 400)
 
 
+class ListViewTest(BaseTestCase):
+	@classmethod
+	def setUpTestData(cls):
+		# Read-only rows: created once per class and rolled back at class
+		# teardown instead of re-inserted before every test method.
+		ConversionTask.objects.bulk_create([
+			ConversionTask(status=ConversionTask.STATUS_DONE, original_filename=f'file{i}.md', progress=100)
+			for i in range(5)
+		], batch_size=500)
+
+	def test_list_shows_done_tasks(self):
+		response = self.client.get(reverse('md2docx:list'))
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.context['page_obj'].paginator.count, 5)
+
+	def test_list_pagination_default(self):
+		ConversionTask.objects.bulk_create([
+			ConversionTask(status=ConversionTask.STATUS_DONE, original_filename=f'extra{i}.md', progress=100)
+			for i in range(10)
+		], batch_size=500)
+		response = self.client.get(reverse('md2docx:list'))
+		self.assertEqual(response.status_code, 200)
+		# default page size is 10
+		self.assertEqual(len(response.context['page_obj'].object_list), 10)
+
+
+class UrlTemplateCacheTest(BaseTestCase):
+	def test_cached_templates_match_reverse(self):
+		# Guards the precomputed URL templates in views against URLconf edits.
+		import uuid
+		from . import views
+		task_id = uuid.uuid4()
+		self.assertEqual(views._status_url(task_id), reverse('md2docx:status', args=[task_id]))
+		self.assertEqual(views._download_url(task_id), reverse('md2docx:download', args=[task_id]))
+
+
 class StatusAndDownloadTest(BaseTestCase):
 	def setUp(self):
 		super().setUp()
@@ -82,8 +155,79 @@ class StatusAndDownloadTest(BaseTestCase):
 		output_path.write_bytes(b"dummy")
 		self.task.result_file.name = output_path.relative_to(media_root).as_posix()
 		self.task.status = ConversionTask.STATUS_DONE
-		self.task.save()
+		self.task.save(update_fields=['result_file', 'status', 'updated_at'])
 
 		response = self.client.get(reverse('md2docx:download', args=[self.task.id]))
 		self.assertEqual(response.status_code, 200)
 		self.assertEqual(response['Content-Disposition'].split('filename=')[1].strip('"'), f"{self.task.id}.pdf")
+
+
+class _StubPandocHandler(BaseHTTPRequestHandler):
+	"""Speaks just enough of the pandoc server protocol for the client tests."""
+
+	def do_POST(self):
+		length = int(self.headers.get('Content-Length', 0))
+		request = json.loads(self.rfile.read(length))
+		if self.path == '/':
+			payload = self._convert(request)
+		elif self.path == '/batch':
+			payload = [self._convert(item) for item in request]
+		else:
+			self.send_error(404)
+			return
+		data = json.dumps(payload).encode('utf-8')
+		self.send_response(200)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+
+	@staticmethod
+	def _convert(item):
+		if item['text'] == 'boom':
+			return {'error': 'stub conversion failure'}
+		return {'output': f"<p>{item['text']}</p>"}
+
+	def log_message(self, *args):  # keep test output quiet
+		pass
+
+
+class PandocServerClientTest(SimpleTestCase):
+	"""Runs the pandoc_server client against a stubbed HTTP server."""
+
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		cls.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _StubPandocHandler)
+		threading.Thread(target=cls.httpd.serve_forever, daemon=True).start()
+		cls._saved_port = pandoc_server.SERVER_PORT
+		pandoc_server.SERVER_PORT = cls.httpd.server_address[1]
+		pandoc_server._drop_connection()
+
+	@classmethod
+	def tearDownClass(cls):
+		pandoc_server._drop_connection()
+		pandoc_server.SERVER_PORT = cls._saved_port
+		cls.httpd.shutdown()
+		cls.httpd.server_close()
+		super().tearDownClass()
+
+	def setUp(self):
+		self.tmpdir = Path(tempfile.mkdtemp())
+
+	def test_convert_writes_output(self):
+		out = self.tmpdir / 'out.html'
+		pandoc_server.convert('hello', 'markdown', 'html', out)
+		self.assertEqual(out.read_text(encoding='utf-8'), '<p>hello</p>')
+
+	def test_batch_reports_per_item_errors(self):
+		paths = [self.tmpdir / 'a.html', self.tmpdir / 'b.html']
+		errors = pandoc_server.convert_batch(['good', 'boom'], 'markdown', 'html', paths)
+		self.assertIsNone(errors[0])
+		self.assertIn('stub conversion failure', errors[1])
+		self.assertEqual(paths[0].read_text(encoding='utf-8'), '<p>good</p>')
+		self.assertFalse(paths[1].exists())
+
+	def test_single_convert_raises_on_error_item(self):
+		with self.assertRaises(pandoc_server.PandocServerError):
+			pandoc_server.convert('boom', 'markdown', 'html', self.tmpdir / 'c.html')
@@ -1,17 +1,24 @@
+import functools
 import os
+import shutil
+import uuid
 from pathlib import Path
 from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
 from django.http import FileResponse, Http404, JsonResponse, HttpResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse
+from django.utils.functional import cached_property
 from django.views.decorators.http import require_http_methods, require_POST
 from django.views.decorators.csrf import csrf_exempt
-from . import views_list_and_api as _list_api
+from types import MappingProxyType
+try:
+    import orjson
+except ImportError:  # optional: stdlib JsonResponse is the fallback
+    orjson = None
 from .models import ConversionTask
-from .formats import SUPPORTED_OUTPUTS, allowed_outputs as get_allowed_outputs
-
-# re-export for urls.py
-list_conversions = _list_api.list_conversions
+from .formats import SUPPORTED_OUTPUTS, DEFAULT_OUTPUT
 
 # Create your views here.
 # Minimal, importable view stubs for md2docx.urls
@@ -22,8 +29,117 @@ list_conversions = _list_api.list_conversions
 MEDIA_ROOT = Path(getattr(settings, "MEDIA_ROOT", settings.BASE_DIR))  # fallback to BASE_DIR if MEDIA_ROOT missing
 EXPORTS_DIR = MEDIA_ROOT / "exports"
 UPLOADS_DIR = MEDIA_ROOT / "uploads"
-EXPORTS_DIR.mkdir(parents=True, exist_ok=True)
-UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+# Both directories are created once in Md2DocxConfig.ready().
+
+# str prefixes precomputed once: the polling/download fallbacks build
+# candidate paths per request, and plain concatenation avoids the Path
+# object churn there.
+_EXPORTS_STR = str(EXPORTS_DIR) + os.sep
+_EXPORTS_REL = "exports/"
+
+
+# Cache key for the done-task count; cleared by signals when a task finishes.
+DONE_COUNT_CACHE_KEY = 'ct:done:count'
+_DONE_COUNT_TTL = 30
+
+# Whitelisted page sizes for the list view; anything else falls back to 10.
+_PER_PAGE_MAP = {'10': 10, '25': 25, '50': 50}
+
+# Frozen view of the format table, resolved once at import: membership
+# checks on the upload paths become O(1) frozenset lookups instead of a
+# function call plus list scan per request. The ordered lists in
+# SUPPORTED_OUTPUTS are still used where formats are displayed.
+_ALLOWED = MappingProxyType({ext: frozenset(outs) for ext, outs in SUPPORTED_OUTPUTS.items()})
+_DEFAULT_ALLOWED = frozenset((DEFAULT_OUTPUT,))
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator that caches COUNT(*) for the done-task list.
+
+    The completed-task table is append-mostly, so a TTL-stale count is
+    fine and saves a full-table COUNT(*) on every page load. A post_save
+    receiver drops the key when a task finishes in this process; with the
+    default per-process LocMemCache, tasks completed by the external
+    process_tasks worker only show up once the TTL expires (a shared
+    backend like Redis in CACHES would make that invalidation immediate).
+    """
+
+    @cached_property
+    def count(self):
+        value = cache.get(DONE_COUNT_CACHE_KEY)
+        if value is None:
+            value = self.object_list.count()
+            cache.set(DONE_COUNT_CACHE_KEY, value, _DONE_COUNT_TTL)
+        return value
+
+
+def list_conversions(request):
+    # Lookup/isdecimal instead of int(): garbage query strings (crawlers,
+    # fuzzers) fall back to defaults rather than raising a 500. isdecimal,
+    # not isdigit — the latter accepts characters int() rejects (e.g. '²').
+    per_page = _PER_PAGE_MAP.get(request.GET.get('per_page', ''), 10)
+    raw_page = request.GET.get('page', '1')
+    page = int(raw_page) if raw_page.isdecimal() else 1
+
+    # values() rows skip model instantiation entirely; the template only
+    # reads these five fields per row.
+    qs = ConversionTask.objects.filter(status=ConversionTask.STATUS_DONE).order_by('-updated_at').values(
+        'id', 'original_filename', 'output_format', 'updated_at', 'result_file',
+    )
+    paginator = CachedCountPaginator(qs, per_page)
+    page_obj = paginator.get_page(page)
+
+    return render(request, 'md2docx/list.html', {'page_obj': page_obj, 'per_page': per_page})
+
+
+def _json(payload, status=200):
+    """JSON response via orjson when installed, else stdlib JsonResponse.
+
+    The status endpoint is polled constantly; orjson serializes small
+    dicts several times faster than the stdlib encoder and emits bytes
+    directly, skipping the str-encode step.
+    """
+    if orjson is not None:
+        return HttpResponse(orjson.dumps(payload), status=status, content_type='application/json')
+    return JsonResponse(payload, status=status)
+
+
+# Sentinel UUID used to turn a reversed URL into a format template.
+_SENTINEL_UUID = '00000000-0000-0000-0000-000000000000'
+
+
+@functools.lru_cache(maxsize=None)
+def _url_template(name):
+    """Resolve a task-id URL pattern once and reuse it as a str template.
+
+    reverse() walks the URL patterns with Python-level regex work on every
+    call; the hot endpoints build several task URLs per request. Resolved
+    lazily (not at import) because this module loads while the URLconf is
+    still being built.
+    """
+    return reverse(name, args=[_SENTINEL_UUID]).replace(_SENTINEL_UUID, '{}')
+
+
+def _status_url(task_id):
+    return _url_template('md2docx:status').format(task_id)
+
+
+def _download_url(task_id):
+    return _url_template('md2docx:download').format(task_id)
+
+
+def _save_upload(uploaded, dest):
+    """Persist an uploaded file to ``dest`` with the cheapest available copy.
+
+    Uploads Django already spooled to a temp file are moved into place (a
+    rename when on the same filesystem); in-memory uploads are streamed with
+    copyfileobj in 1MB blocks rather than a Python-level chunk loop.
+    """
+    if hasattr(uploaded, 'temporary_file_path'):
+        shutil.move(uploaded.temporary_file_path(), dest)
+        return
+    with dest.open("wb") as fh:
+        shutil.copyfileobj(uploaded, fh, length=1 << 20)
 
 
 def home(request):
@@ -35,7 +151,7 @@ def home(request):
         return render(request, "md2docx/home.html", {
             "convert_url": reverse("md2docx:convert"),
             "supported_outputs": SUPPORTED_OUTPUTS,
-            "default_outputs": get_allowed_outputs('md'),
+            "default_outputs": SUPPORTED_OUTPUTS['md'],
         })
     except Exception:
         # Fallback minimal HTML so server is runnable without templates
@@ -87,44 +203,37 @@ def convert_markdown(request):
     else:
         input_ext = 'md'
 
-    allowed_outputs = get_allowed_outputs(input_ext)
     chosen_output = request.POST.get('output_format', 'docx').lower()
-    if chosen_output not in allowed_outputs:
+    if chosen_output not in _ALLOWED.get(input_ext, _DEFAULT_ALLOWED):
         return render(request, "md2docx/convert.html", {
             "error": f"Unsupported output format '{chosen_output}' for input type '{input_ext or 'unknown'}'.",
-            "allowed_outputs": allowed_outputs,
+            "allowed_outputs": SUPPORTED_OUTPUTS.get(input_ext, [DEFAULT_OUTPUT]),
             "task": None,
             "task_id": None,
         }, status=400)
 
-    task = ConversionTask.objects.create(
-        status=ConversionTask.STATUS_PENDING,
-        output_format=chosen_output,
-        original_filename=original_name,
-    )
-
+    # Generate the id in Python so the input can be written (and URLs built)
+    # before the INSERT; the background processor then never races a task
+    # whose upload is not on disk yet.
     dest_ext = input_ext or 'md'
-    saved_path = None
+    task_id = uuid.uuid4()
+    dest = UPLOADS_DIR / f"{task_id}.{dest_ext}"
     if uploaded:
-        dest = UPLOADS_DIR / f"{task.id}.{dest_ext}"
-        with dest.open("wb") as fh:
-            for chunk in uploaded.chunks():
-                fh.write(chunk)
-        saved_path = str(dest)
+        _save_upload(uploaded, dest)
     else:
-        dest = UPLOADS_DIR / f"{task.id}.{dest_ext}"
         dest.write_text(markdown_text, encoding="utf-8")
-        saved_path = str(dest)
 
-    # persist metadata
-    if saved_path:
-        task.input_markdown = ''  # we store file on disk; input_markdown field kept blank
-        task.progress = 0
-        task.save()
+    task = ConversionTask.objects.create(
+        id=task_id,
+        status=ConversionTask.STATUS_PENDING,
+        output_format=chosen_output,
+        original_filename=original_name,
+        input_ext=dest_ext,
+    )
 
     # Build links for the confirmation page
-    status_url = reverse("md2docx:status", args=[task.id])
-    download_url = reverse("md2docx:download", args=[task.id])
+    status_url = _status_url(task_id)
+    download_url = _download_url(task_id)
 
     context = {
         "task": task,
@@ -135,7 +244,7 @@ def convert_markdown(request):
     }
 
     # Render an HTML confirmation page instead of JSON so users get clickable links
-    context["allowed_outputs"] = allowed_outputs
+    context["allowed_outputs"] = SUPPORTED_OUTPUTS.get(input_ext, [DEFAULT_OUTPUT])
     return render(request, "md2docx/convert.html", context, status=202)
 
 
@@ -144,16 +253,20 @@ def status(request, task_id):
     Return a minimal JSON status for the given UUID task_id.
     Real implementations should look up persistent task state.
     """
-    # Report DB-backed task state when available
-    try:
-        task = ConversionTask.objects.get(pk=task_id)
-    except ConversionTask.DoesNotExist:
-        docx_path = EXPORTS_DIR / f"{task_id}.docx"
-        if docx_path.exists():
-            payload = {"status": "done", "task_id": str(task_id), "download_url": reverse("md2docx:download", args=[task_id])}
+    # Report DB-backed task state when available. This endpoint is polled
+    # every few seconds per task, so project only the fields the payload
+    # reads instead of pulling the whole row, and branch on None for the
+    # miss path rather than paying DoesNotExist construction.
+    task = ConversionTask.objects.only(
+        'id', 'status', 'progress', 'original_filename',
+        'output_format', 'error_message', 'result_file',
+    ).filter(pk=task_id).first()
+    if task is None:
+        if os.path.exists(_EXPORTS_STR + f"{task_id}.docx"):
+            payload = {"status": "done", "task_id": str(task_id), "download_url": _download_url(task_id)}
         else:
             payload = {"status": "pending", "task_id": str(task_id)}
-        return JsonResponse(payload)
+        return _json(payload)
 
     payload = {
         "status": task.status,
@@ -163,19 +276,19 @@ def status(request, task_id):
         "output_format": task.output_format,
     }
     if task.status == ConversionTask.STATUS_DONE and task.result_file:
-        payload["download_url"] = reverse("md2docx:download", args=[task.id])
+        payload["download_url"] = _download_url(task.id)
     if task.status == ConversionTask.STATUS_FAILED:
         payload["error"] = task.error_message
 
     # Response type: default to JSON (backward compatible). Render HTML when explicitly requested.
     wants_html = request.GET.get("format") == "html"
     if not wants_html:
-        return JsonResponse(payload)
+        return _json(payload)
 
     context = {
         "task": task,
         "task_id": str(task.id),
-        "status_url": reverse("md2docx:status", args=[task.id]) + "?format=html",
+        "status_url": _status_url(task.id) + "?format=html",
         "download_url": payload.get("download_url"),
         "error_message": payload.get("error"),
         "output_format": task.output_format,
@@ -183,40 +296,52 @@ def status(request, task_id):
     return render(request, "md2docx/status.html", context)
 
 
+def _serve_media(media_rel_path, filename):
+    """Serve a file below MEDIA_ROOT, offloading to the front-end if enabled.
+
+    With MD2DOCX_USE_XSENDFILE the response carries only an X-Accel-Redirect
+    header and nginx streams the file with sendfile(2); otherwise (dev, tests)
+    fall back to FileResponse through WSGI.
+    """
+    if getattr(settings, 'MD2DOCX_USE_XSENDFILE', False):
+        response = HttpResponse()
+        response['Content-Type'] = 'application/octet-stream'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['X-Accel-Redirect'] = settings.MD2DOCX_ACCEL_PREFIX + str(media_rel_path)
+        return response
+    return FileResponse((MEDIA_ROOT / media_rel_path).open('rb'), as_attachment=True, filename=filename)
+
+
 def download_docx(request, task_id):
     """
     Stream the generated .docx file for the given task_id.
     Raises 404 if the file does not exist.
     """
-    # Prefer DB-backed stored file if available
-    try:
-        task = ConversionTask.objects.get(pk=task_id)
+    # Prefer DB-backed stored file if available. When the DB already says
+    # the task finished we trust its path outright — no stat before serving.
+    task = ConversionTask.objects.only('result_file', 'output_format').filter(pk=task_id).first()
+    if task is not None:
         if task.result_file and task.result_file.name:
             filename = os.path.basename(task.result_file.name)
-            return FileResponse(task.result_file.open('rb'), as_attachment=True, filename=filename)
+            return _serve_media(task.result_file.name, filename)
         # fallback path based on requested output_format
-        fallback_ext = task.output_format or 'docx'
-        candidate = EXPORTS_DIR / f"{task_id}.{fallback_ext}"
-        if candidate.exists():
-            return FileResponse(candidate.open('rb'), as_attachment=True, filename=f"{task_id}.{fallback_ext}")
-    except ConversionTask.DoesNotExist:
-        pass
+        fallback_name = f"{task_id}.{task.output_format or 'docx'}"
+        if os.path.exists(_EXPORTS_STR + fallback_name):
+            return _serve_media(_EXPORTS_REL + fallback_name, fallback_name)
 
     # final fallback: legacy .docx path
-    docx_path = EXPORTS_DIR / f"{task_id}.docx"
-    if not docx_path.exists():
+    legacy_name = f"{task_id}.docx"
+    if not os.path.exists(_EXPORTS_STR + legacy_name):
         raise Http404("Document not found. Conversion may still be pending.")
 
-    response = FileResponse(open(docx_path, "rb"), as_attachment=True, filename=f"{task_id}.docx")
-    return response
+    return _serve_media(_EXPORTS_REL + legacy_name, legacy_name)
 
 
 @require_POST
 def delete_task(request, task_id):
     """Delete a conversion task and its files, then redirect back to list."""
-    try:
-        task = ConversionTask.objects.get(pk=task_id)
-    except ConversionTask.DoesNotExist:
+    task = ConversionTask.objects.filter(pk=task_id).first()
+    if task is None:
         return redirect(reverse("md2docx:list"))
 
     # Remove output file
@@ -249,7 +374,7 @@ def api_upload(request):
     markdown_text = request.POST.get("markdown", "")
 
     if not uploaded and not markdown_text:
-        return JsonResponse({"error": "No file or markdown provided"}, status=400)
+        return _json({"error": "No file or markdown provided"}, status=400)
 
     original_name = getattr(uploaded, 'name', '') if uploaded else ''
     input_ext = ''
@@ -260,41 +385,37 @@ def api_upload(request):
     else:
         input_ext = 'md'
 
-    allowed_outputs = get_allowed_outputs(input_ext)
     chosen_output = request.POST.get('output_format', 'docx').lower()
-    if chosen_output not in allowed_outputs:
-        return JsonResponse({
+    if chosen_output not in _ALLOWED.get(input_ext, _DEFAULT_ALLOWED):
+        return _json({
             "error": f"Unsupported output format '{chosen_output}' for input type '{input_ext or 'unknown'}'.",
-            "allowed_outputs": allowed_outputs,
+            "allowed_outputs": SUPPORTED_OUTPUTS.get(input_ext, [DEFAULT_OUTPUT]),
         }, status=400)
 
-    task = ConversionTask.objects.create(
-        status=ConversionTask.STATUS_PENDING,
-        output_format=chosen_output,
-        original_filename=original_name,
-    )
-
+    # Generate the id in Python so the input hits disk before the INSERT:
+    # the background processor can never claim a task whose upload is
+    # missing, and the payload URLs don't depend on the returned row.
     dest_ext = input_ext or 'md'
-    saved_path = None
+    task_id = uuid.uuid4()
+    dest = UPLOADS_DIR / f"{task_id}.{dest_ext}"
     if uploaded:
-        dest = UPLOADS_DIR / f"{task.id}.{dest_ext}"
-        with dest.open("wb") as fh:
-            for chunk in uploaded.chunks():
-                fh.write(chunk)
-        saved_path = str(dest)
+        _save_upload(uploaded, dest)
     else:
-        dest = UPLOADS_DIR / f"{task.id}.{dest_ext}"
         dest.write_text(markdown_text, encoding="utf-8")
-        saved_path = str(dest)
 
-    task.progress = 0
-    task.save()
+    task = ConversionTask.objects.create(
+        id=task_id,
+        status=ConversionTask.STATUS_PENDING,
+        output_format=chosen_output,
+        original_filename=original_name,
+        input_ext=dest_ext,
+    )
 
     payload = {
         "status": task.status,
-        "task_id": str(task.id),
-        "saved_input": saved_path,
-        "status_url": reverse("md2docx:status", args=[task.id]),
-        "download_url": reverse("md2docx:download", args=[task.id]),
+        "task_id": str(task_id),
+        "saved_input": str(dest),
+        "status_url": _status_url(task_id),
+        "download_url": _download_url(task_id),
     }
-    return JsonResponse(payload, status=201)
\ No newline at end of file
+    return _json(payload, status=201)
\ No newline at end of file